@@ -1,14 +1,22 @@
 """Interface to Google Mail."""
 
 import base64
+import errno
 import os
+import threading
+import time
 from argparse import Namespace
+from http import HTTPStatus
 from typing import Any, Iterator
 
 import libgoogle
 import xdg
+from googleapiclient.errors import HttpError  # type: ignore[import-untyped]
 from loguru import logger
 
+from gmail.listcache import ListCache
+from gmail.store import MessageStore
+
 __all__ = ["GoogleMailAPI"]
 
 
@@ -19,16 +27,41 @@ class GoogleMailAPI:
     """
 
     mimetype_PDF = "application/pdf"
+    max_batch_size = 50  # requests per batch; larger batches are rate limited
+    num_retries = 5  # retries, with exponential backoff, of rate limited requests
+    max_list_results = 500  # ids per `list` page
 
     def __init__(self, options: Namespace) -> None:
         """Connect to Google Mail."""
 
         self.options = options
-        self.service = libgoogle.connect("gmail.readonly", "v1")
+        self._local = threading.local()
+        self._local.service = libgoogle.connect("gmail.readonly", "v1")
 
         self.download_dir = xdg.xdg_data_home() / "gmail"
         self.user_id = "me"
 
+        self.store: MessageStore | None = None
+        if getattr(options, "store", False):
+            self.store = MessageStore(self.download_dir / "store")
+            self.sync_store()
+
+        self.list_cache: ListCache | None = None
+        if getattr(options, "cache", False):
+            self.list_cache = ListCache(xdg.xdg_cache_home() / "gmail" / "lists")
+
+    @property
+    def service(self) -> Any:
+        """Return this thread's connection to the service.
+
+        `httplib2` is not thread-safe, so each thread gets its own connection.
+        """
+
+        if (service := getattr(self._local, "service", None)) is None:
+            logger.debug("Connecting thread {!r}", threading.current_thread().name)
+            service = self._local.service = libgoogle.connect("gmail.readonly", "v1")
+        return service
+
     @staticmethod
     def default_label_ids() -> list[str]:
         """Return list of default label ids."""
@@ -53,12 +86,202 @@ class GoogleMailAPI:
         assert isinstance(labels, list)
         return labels
 
+    def get_history_id(self) -> str:
+        """Return the mailbox's current `historyId`."""
+
+        # https://developers.google.com/gmail/api/reference/rest/v1/users/getProfile
+
+        parms = {"userId": self.user_id}
+
+        logger.debug("service.users().getProfile({!r})", parms)
+        response = self.service.users().getProfile(**parms).execute()
+        logger.trace("response {!r}", response)
+
+        return str(response["historyId"])
+
+    def get_history_records(
+        self,
+        start_history_id: str,
+        history_types: list[str] | None = None,
+        label_id: str | None = None,
+    ) -> tuple[list[dict[str, Any]], str]:
+        """Return history records since `start_history_id`, and the new `historyId`.
+
+        Raises `googleapiclient.errors.HttpError` (404) when `start_history_id`
+        is too old; the caller should resync with `get_history_id`.
+        """
+
+        # https://developers.google.com/gmail/api/reference/rest/v1/users.history/list
+
+        parms = {
+            "userId": self.user_id,
+            "startHistoryId": start_history_id,
+            "historyTypes": history_types,
+            "labelId": label_id,
+        }
+
+        records: list[dict[str, Any]] = []
+        history_id = start_history_id
+
+        while True:
+            logger.debug("service.users().history().list({!r})", parms)
+            response = self.service.users().history().list(**parms).execute()
+            logger.trace("response {!r}", response)
+
+            records.extend(response.get("history", []))
+            history_id = str(response.get("historyId", history_id))
+
+            parms["pageToken"] = response.get("nextPageToken")
+            if parms["pageToken"] is None:
+                return records, history_id
+
+    def get_history(
+        self,
+        start_history_id: str,
+        label_id: str | None = None,
+    ) -> tuple[list[tuple[str, str]], str]:
+        """Return messages added since `start_history_id`, and the new `historyId`.
+
+        Each message is returned as `(msg_id, history_id)`, where `history_id`
+        is that of the record that added it; resuming from it skips the message.
+        """
+
+        records, history_id = self.get_history_records(
+            start_history_id, history_types=["messageAdded"], label_id=label_id
+        )
+
+        msg_ids: dict[str, str] = {}  # ordered
+        for history in records:
+            for added in history.get("messagesAdded", []):
+                msg_ids.setdefault(added["message"]["id"], str(history["id"]))
+
+        return list(msg_ids.items()), history_id
+
     def get_next_msg_id(
         self,
         label_ids: list[str] | None = None,
         search_query: str | None = None,
     ) -> Iterator[str]:
-        """Return the messages in the user's mailbox."""
+        """Return the messages in the user's mailbox.
+
+        With a list cache, a repeated enumeration costs one `history.list`
+        request instead of paging through `messages.list`; ids patched from
+        history may not be in date order (see `ListCache`).
+        """
+
+        if self.list_cache is None:
+            yield from self._list_msg_ids(label_ids, search_query)
+            return
+
+        if (msg_ids := self._get_cached_msg_ids(label_ids, search_query)) is not None:
+            yield from msg_ids
+            return
+
+        # Capture the position first, so changes made while listing are replayed.
+        listed_at = time.time()
+        history_id = self.get_history_id()
+        msg_ids = []
+        for msg_id in self._list_msg_ids(label_ids, search_query):
+            msg_ids.append(msg_id)
+            yield msg_id
+
+        # Only complete enumerations are cached.
+        self.list_cache.save(label_ids, search_query, history_id, msg_ids, listed_at)
+
+    def _get_cached_msg_ids(
+        self,
+        label_ids: list[str] | None,
+        search_query: str | None,
+    ) -> list[str] | None:
+        """Return cached ids brought up to date with history, or None to re-list."""
+
+        assert self.list_cache is not None
+        if (entry := self.list_cache.load(label_ids, search_query)) is None:
+            return None
+
+        # With one label, history of messages without it cannot affect the list.
+        key_labels, _ = self.list_cache.key(label_ids, search_query)
+        listed_at = time.time()
+        try:
+            records, history_id = self.get_history_records(
+                entry["history_id"],
+                label_id=key_labels[0] if len(key_labels) == 1 else None,
+            )
+        except HttpError as err:  # pragma: no cover
+            if err.status_code != HTTPStatus.NOT_FOUND:
+                raise
+            logger.debug("Cached historyId {} expired", entry["history_id"])
+            return None
+
+        if not records:
+            logger.debug("Cache hit for {!r}", (label_ids, search_query))
+            msg_ids: list[str] = entry["msg_ids"]
+            if history_id != entry["history_id"]:
+                self.list_cache.save(label_ids, search_query, history_id, msg_ids, listed_at)
+            return msg_ids
+
+        recent_ids = None
+        if (recent_query := self.list_cache.recent_query(entry, records)) is not None:
+            recent_ids = list(self._list_msg_ids(label_ids, recent_query))
+
+        if (patched := self.list_cache.patch(entry, records, recent_ids)) is not None:
+            logger.debug("Cache patched for {!r}", (label_ids, search_query))
+            self.list_cache.save(label_ids, search_query, history_id, patched, listed_at)
+        return patched
+
+    def sync_store(self) -> None:
+        """Bring the mutable fields of stored messages up to date with history.
+
+        Message content never changes, but `labelIds` (e.g., `UNREAD`,
+        `INBOX`) and `historyId` do. Label changes since the store's
+        `historyId` are applied to the stored messages, and deleted
+        messages are discarded. If that history has expired, the store
+        is cleared, and messages are fetched again as they are read.
+        """
+
+        assert self.store is not None
+        if (start_history_id := self.store.history_id) is None:
+            self.store.history_id = self.get_history_id()
+            return
+
+        try:
+            records, history_id = self.get_history_records(
+                start_history_id,
+                history_types=["labelAdded", "labelRemoved", "messageDeleted"],
+            )
+        except HttpError as err:  # pragma: no cover
+            if err.status_code != HTTPStatus.NOT_FOUND:
+                raise
+            logger.warning("Store historyId {} expired; clearing store", start_history_id)
+            self.store.clear()
+            self.store.history_id = self.get_history_id()
+            return
+
+        changed: dict[str, tuple[list[str], str]] = {}
+        deleted: set[str] = set()
+        for record in records:
+            for kind in ("labelsAdded", "labelsRemoved"):
+                for change in record.get(kind, []):
+                    msg = change["message"]
+                    changed[msg["id"]] = (msg.get("labelIds", []), record["id"])
+            for change in record.get("messagesDeleted", []):
+                deleted.add(change["message"]["id"])
+
+        for msg_id, (label_ids, msg_history_id) in changed.items():
+            if msg_id in self.store and msg_id not in deleted:
+                self.store.set_labels(msg_id, label_ids, msg_history_id)
+        for msg_id in deleted:
+            self.store.discard(msg_id)
+
+        logger.debug("Synced store from historyId {} to {}", start_history_id, history_id)
+        self.store.history_id = history_id
+
+    def _list_msg_ids(
+        self,
+        label_ids: list[str] | None,
+        search_query: str | None,
+    ) -> Iterator[str]:
+        """Page through `messages.list`."""
 
         # https://developers.google.com/gmail/api/v1/reference/users/messages/list
 
@@ -66,6 +289,7 @@ class GoogleMailAPI:
             "userId": self.user_id,
             "labelIds": label_ids,
             "q": search_query,
+            "maxResults": self.max_list_results,
         }
 
         while True:
@@ -80,27 +304,172 @@ class GoogleMailAPI:
             if parms["pageToken"] is None:
                 return
 
-    def get_message(self, msg_id: str) -> dict[str, Any]:
-        """Return specified message."""
+    def get_message(
+        self,
+        msg_id: str,
+        fmt: str = "full",
+        metadata_headers: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """Return specified message.
+
+        Use `fmt="metadata"` to fetch only ids, labels, sizes, dates and
+        the `metadata_headers` (all headers if None), without the body.
+        """
 
         # https://developers.google.com/gmail/api/v1/reference/users/messages/get
 
-        parms = {
+        if self.store is not None and fmt == "full" and msg_id in self.store:
+            logger.debug("store.get({!r})", msg_id)
+            return self.store.get(msg_id)
+
+        parms: dict[str, Any] = {
             "userId": self.user_id,
             "id": msg_id,
+            "format": fmt,
         }
+        if metadata_headers is not None:
+            parms["metadataHeaders"] = metadata_headers
 
         logger.debug("service.users().messages().get({!r})", parms)
         response = self.service.users().messages().get(**parms).execute()
         logger.trace("response {!r}", response)
 
         assert isinstance(response, dict)
+        if self.store is not None and fmt == "full":
+            self.store.put(response)
         return response
 
-    def get_next_attachment_id(self, msg_id: str) -> Iterator[tuple[str, str, str]]:
-        """Docstring."""
+    def get_messages(
+        self,
+        msg_ids: list[str],
+        fmt: str = "metadata",
+        metadata_headers: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return specified messages, in order, fetched in one batch request.
+
+        At most `max_batch_size` ids per call. Messages that fail within
+        the batch (e.g., rate limited) are fetched again one at a time,
+        with up to `num_retries` retries and exponential backoff. Messages
+        deleted since they were listed are logged and left out.
+        Does not read or write the message store.
+        """
+
+        # https://developers.google.com/gmail/api/guides/batch
+
+        assert len(msg_ids) <= self.max_batch_size
+        responses: dict[str, dict[str, Any]] = {}
+        failed: list[str] = []
+
+        def _request(msg_id: str) -> Any:
+            parms: dict[str, Any] = {
+                "userId": self.user_id,
+                "id": msg_id,
+                "format": fmt,
+            }
+            if metadata_headers is not None:
+                parms["metadataHeaders"] = metadata_headers
+            return self.service.users().messages().get(**parms)
+
+        def _callback(request_id: str, response: Any, exception: Exception | None) -> None:
+            if exception is None:
+                responses[request_id] = response
+            elif (
+                isinstance(exception, HttpError)
+                and exception.status_code == HTTPStatus.NOT_FOUND
+            ):
+                logger.warning("Message {!r} vanished", request_id)
+            else:
+                logger.debug("Batch get {!r} failed: {}", request_id, exception)
+                failed.append(request_id)
+
+        batch = self.service.new_batch_http_request(callback=_callback)
+        for msg_id in msg_ids:
+            batch.add(_request(msg_id), request_id=msg_id)
+
+        logger.debug("service.new_batch_http_request() with {} gets", len(msg_ids))
+        batch.execute()
 
-        msg = self.get_message(msg_id)
+        for msg_id in failed:
+            logger.debug("service.users().messages().get({!r}) retry", msg_id)
+            try:
+                responses[msg_id] = _request(msg_id).execute(num_retries=self.num_retries)
+            except HttpError as err:
+                if err.status_code != HTTPStatus.NOT_FOUND:
+                    raise
+                logger.warning("Message {!r} vanished", msg_id)
+
+        return [responses[_] for _ in msg_ids if _ in responses]
+
+    def get_next_thread_id(
+        self,
+        label_ids: list[str] | None = None,
+        search_query: str | None = None,
+    ) -> Iterator[str]:
+        """Return the threads in the user's mailbox."""
+
+        # https://developers.google.com/gmail/api/reference/rest/v1/users.threads/list
+
+        parms = {
+            "userId": self.user_id,
+            "labelIds": label_ids,
+            "q": search_query,
+            "maxResults": self.max_list_results,
+        }
+
+        while True:
+            logger.debug("service.users().threads().list({!r})", parms)
+            response = self.service.users().threads().list(**parms).execute()
+            logger.trace("response {!r}", response)
+
+            for _ in response.get("threads", []):
+                yield _["id"]
+
+            parms["pageToken"] = response.get("nextPageToken")
+            if parms["pageToken"] is None:
+                return
+
+    def get_thread(
+        self,
+        thread_id: str,
+        fmt: str = "full",
+        metadata_headers: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """Return specified thread, with all of its messages, in one request."""
+
+        # https://developers.google.com/gmail/api/reference/rest/v1/users.threads/get
+
+        parms: dict[str, Any] = {
+            "userId": self.user_id,
+            "id": thread_id,
+            "format": fmt,
+        }
+        if metadata_headers is not None:
+            parms["metadataHeaders"] = metadata_headers
+
+        logger.debug("service.users().threads().get({!r})", parms)
+        response = self.service.users().threads().get(**parms).execute()
+        logger.trace("response {!r}", response)
+
+        assert isinstance(response, dict)
+        return response
+
+    def get_next_attachment_id(
+        self,
+        msg_id: str,
+        msg: dict[str, Any] | None = None,
+    ) -> Iterator[tuple[str, str, str, int, str]]:
+        """Yield `(mimetype, filename, attachment_id, size, name)` of each attachment.
+
+        `filename` is the download path; `name` is the part's original filename.
+        Paths are unique within the message: a repeated `name` (e.g., inline
+        `image.png`) also gets the part's `partId`.
+
+        Uses only the message's metadata; no attachment data is fetched.
+        Pass `msg` if the full message has already been fetched.
+        """
+
+        if msg is None:
+            msg = self.get_message(msg_id)
 
         payload = msg.get("payload")
         if not payload:
@@ -112,13 +481,17 @@ class GoogleMailAPI:
             logger.debug("No parts")  # pragma: no cover
             return  # pragma: no cover
 
+        seen: set[str] = set()
         for part in self._flatten_nested_email_parts(parts):
             mimetype = part.get("mimeType")
 
             basename, ext = os.path.splitext(part["filename"])
             filename = os.path.join(self.download_dir, basename + "-" + msg_id + ext)
+            if filename in seen:
+                suffix = "-" + msg_id + "-" + part.get("partId", str(len(seen)))
+                filename = os.path.join(self.download_dir, basename + suffix + ext)
 
-            body: dict[str, str] | None = part.get("body")
+            body: dict[str, Any] | None = part.get("body")
             attachment_id = body.get("attachmentId") if body else None
 
             logger.debug(
@@ -141,7 +514,25 @@ class GoogleMailAPI:
                 logger.debug("Missing attachmentId")
                 continue
 
-            yield mimetype, filename, attachment_id
+            seen.add(filename)
+            yield mimetype, filename, attachment_id, int(body.get("size", 0)), part["filename"]
+
+    @classmethod
+    def is_media(cls, mimetype: str) -> bool:
+        """Return True if `mimetype` is an image, video or pdf."""
+        return mimetype[:5] in ("image", "video") or mimetype == cls.mimetype_PDF
+
+    def download_attachment(self, msg_id: str, attachment_id: str, filename: str) -> None:
+        """Download attachment into `filename`."""
+
+        try:
+            os.makedirs(self.download_dir)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise  # pragma: no cover
+
+        with open(filename, "wb") as _:
+            _.write(self.get_attachment_data(msg_id, attachment_id))
 
     def get_attachment_data(self, msg_id: str, attachment_id: str) -> bytes:
         """Docstring."""
@@ -1,10 +1,14 @@
 """Command Line Interface to Google Mail."""
 
+import shlex
+import sys
+from contextlib import ExitStack
 from pathlib import Path
 
 from libcli import BaseCLI
 
 from gmail.api import GoogleMailAPI
+from gmail.profiling import cpu_profile, trace_malloc
 
 __all__ = ["GoogleMailCLI"]
 
@@ -35,6 +39,31 @@ class GoogleMailCLI(BaseCLI):
     def add_arguments(self) -> None:
         """Add arguments to parser."""
 
+        self.parser.add_argument(
+            "--store",
+            action="store_true",
+            help="read messages through a compressed local message store",
+        )
+
+        self.parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="cache message lists; refresh them from mailbox history",
+        )
+
+        self.parser.add_argument(
+            "--profile",
+            type=Path,
+            metavar="FILE",
+            help="profile the command; save `pstats` to `FILE` and print a summary",
+        )
+
+        self.parser.add_argument(
+            "--trace-malloc",
+            action="store_true",
+            help="track allocations; print the top allocation sites and peak memory",
+        )
+
         self.add_subcommand_modules("gmail.commands", prefix="Mail", suffix="Cmd")
 
     def main(self) -> None:
@@ -45,7 +74,14 @@ class GoogleMailCLI(BaseCLI):
             self.parser.exit(2, "error: Missing COMMAND\n")
 
         self.api = GoogleMailAPI(self.options)
-        self.options.cmd()
+
+        with ExitStack() as stack:
+            tag = shlex.join([self.parser.prog, *(self.argv or sys.argv[1:])])
+            if self.options.profile:
+                stack.enter_context(cpu_profile(self.options.profile, tag))
+            if self.options.trace_malloc:
+                stack.enter_context(trace_malloc(tag))
+            self.options.cmd()
 
 
 def main(args: list[str] | None = None) -> None:
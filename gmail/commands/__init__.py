@@ -1,10 +1,13 @@
 """Google Mail Commands."""
 
 from argparse import ArgumentParser, _ArgumentGroup
+from time import localtime, strftime
 from typing import Any, TypeVar
 
 from libcli import BaseCmd
 from loguru import logger
+from rich.console import Console
+from rich.pretty import Pretty
 from rich.pretty import pprint as rich_pretty_print
 
 from gmail.cli import GoogleMailCLI
@@ -54,3 +57,33 @@ class GoogleMailCmd(BaseCmd):
         """Make `pprint` convenient."""
 
         rich_pretty_print(obj, **kwargs)
+
+    @staticmethod
+    def pformat(obj: Any, **kwargs: Any) -> str:
+        """Return what `pprint` would print; safe to call from worker threads."""
+
+        console = Console()
+        with console.capture() as capture:
+            console.print(Pretty(obj, indent_guides=True, **kwargs), soft_wrap=True)
+        return capture.get()
+
+    @staticmethod
+    def format_listing(msg: dict[str, Any]) -> str:
+        """Return a one-line listing (date, from, subject) of `msg`."""
+
+        timestamp = strftime("%Y-%m-%d %H:%M:%S %Z", localtime(int(msg["internalDate"]) / 1000))
+
+        payload = msg["payload"]
+        headers = payload["headers"]
+
+        try:
+            msg_subject = [h["value"] for h in headers if h["name"] == "Subject"][0]
+        except IndexError:  # pragma: no cover
+            msg_subject = ""  # pragma: no cover
+
+        try:
+            msg_from = [h["value"] for h in headers if h["name"] == "From"][0]
+        except IndexError:  # pragma: no cover
+            msg_from = ""  # pragma: no cover
+
+        return str.format("{} {:<40} {}", timestamp, msg_from, msg_subject)
@@ -1,12 +1,27 @@
 """Mail `download` command module."""
 
-import errno
-import os
 from collections import defaultdict
+from fnmatch import fnmatch
 
 from loguru import logger
 
 from gmail.commands import GoogleMailCmd
+from gmail.pipeline import Pipeline
+
+_SIZE_SUFFIXES = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text: str) -> int:
+    """Return number of bytes in `text`; e.g., `512`, `100K`, `2.5M`, `1G`."""
+
+    text = text.strip().upper().removesuffix("B")
+    multiplier = _SIZE_SUFFIXES.get(text[-1:], 1)
+    if multiplier > 1:
+        text = text[:-1]
+    try:
+        return int(float(text) * multiplier)
+    except ValueError:
+        raise ValueError(f"invalid size {text!r}") from None
 
 
 class MailDownloadCmd(GoogleMailCmd):
@@ -20,6 +35,12 @@ class MailDownloadCmd(GoogleMailCmd):
             help="download mail messages",
             description=self.cli.dedent("""
     The `%(prog)s` program downloads a mail message.
+
+    Attachments are selected by mimetype, filename and size from the
+    message's metadata; skipped attachments are never fetched. By
+    default, image, video and pdf attachments are downloaded.
+
+    SIZE may have a suffix of `K`, `M` or `G`.
                 """),
         )
 
@@ -28,33 +49,142 @@ class MailDownloadCmd(GoogleMailCmd):
             help="the id of the message to download",
         )
 
+        group = parser.add_argument_group("Selection options")
+
+        group.add_argument(
+            "--mimetype",
+            action="append",
+            metavar="GLOB",
+            help="download attachments with mimetype matching `GLOB` (repeatable)",
+        )
+
+        group.add_argument(
+            "--filename",
+            action="append",
+            metavar="GLOB",
+            help="download attachments with filename matching `GLOB` (repeatable)",
+        )
+
+        group.add_argument(
+            "--min-size",
+            type=parse_size,
+            metavar="SIZE",
+            help="skip attachments smaller than `SIZE` bytes",
+        )
+
+        group.add_argument(
+            "--max-size",
+            type=parse_size,
+            metavar="SIZE",
+            help="skip attachments larger than `SIZE` bytes",
+        )
+
+        group.add_argument(
+            "--max-bytes",
+            type=parse_size,
+            metavar="SIZE",
+            help="download at most `SIZE` bytes in total",
+        )
+
+        group = parser.add_argument_group("Scheduling options")
+
+        arg = group.add_argument(
+            "--order",
+            choices=["message", "largest", "smallest"],
+            default="message",
+            help="download attachments in message order, or by size",
+        )
+        self.cli.add_default_to_help(arg, group)
+
+        arg = group.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="download with `WORKERS` concurrent requests",
+        )
+        self.cli.add_default_to_help(arg, group)
+
     def run(self) -> None:
         """Run mail `download` command."""
 
         msg_id = self.options.MSG_ID
 
         unknown_mimetypes: dict[str, int] = defaultdict(int)
-
-        for mimetype, filename, attachment_id in self.cli.api.get_next_attachment_id(msg_id):
-            logger.error(
-                f"mimetype={mimetype!r} filename={filename!r} attachment_id={attachment_id!r}"
+        skipped: dict[str, int] = defaultdict(int)
+        selected: list[tuple[str, str, int]] = []
+
+        for mimetype, filename, attachment_id, size, name in self.cli.api.get_next_attachment_id(
+            msg_id
+        ):
+            logger.debug(
+                f"mimetype={mimetype!r} filename={filename!r} attachment_id={attachment_id!r} "
+                f"size={size!r}"
             )
 
-            if mimetype[:5] not in ("image", "video") and mimetype != self.cli.api.mimetype_PDF:
+            if self.options.mimetype:
+                if not any(fnmatch(mimetype, _) for _ in self.options.mimetype):
+                    logger.debug("mimeType {!r} not selected", mimetype)
+                    skipped["mimetype"] += 1
+                    continue
+            elif not self.cli.api.is_media(mimetype):
                 logger.debug("mimeType {!r} not image/video/pdf", mimetype)
                 unknown_mimetypes[mimetype] += 1
                 continue
 
-            print("Downloading", filename)
+            if reason := self._skip_reason(name, size):
+                logger.debug("Skipping {!r} size {}: {}", filename, size, reason)
+                skipped[reason] += 1
+                continue
+
+            selected.append((filename, attachment_id, size))
+
+        if self.options.order != "message":
+            selected.sort(key=lambda _: _[2], reverse=self.options.order == "largest")
+
+        if self.options.max_bytes is not None:
+            selected = self._apply_budget(selected, skipped)
 
-            try:
-                os.makedirs(self.cli.api.download_dir)
-            except OSError as err:
-                if err.errno != errno.EEXIST:
-                    raise  # pragma: no cover
+        def _download(job: tuple[str, str, int]) -> tuple[str, int]:
+            filename, attachment_id, size = job
+            self.cli.api.download_attachment(msg_id, attachment_id, filename)
+            return filename, size
 
-            with open(filename, "wb") as _:
-                _.write(self.cli.api.get_attachment_data(msg_id, attachment_id))
+        with Pipeline(selected, _download, workers=self.options.workers) as pipe:
+            for filename, size in pipe:
+                print(str.format("Downloaded {:>12,d} {}", size, filename))
 
         for mimetype, count in unknown_mimetypes.items():
             print(str.format("unknown mimeType {:5d} {:s}", count, mimetype))
+
+        for reason, count in skipped.items():
+            print(str.format("skipped {:5d} by {:s}", count, reason))
+
+    def _skip_reason(self, name: str, size: int) -> str | None:
+        """Return why attachment `name` should be skipped, or None to select it."""
+
+        if self.options.filename and not any(fnmatch(name, _) for _ in self.options.filename):
+            return "filename"
+        if self.options.min_size is not None and size < self.options.min_size:
+            return "min-size"
+        if self.options.max_size is not None and size > self.options.max_size:
+            return "max-size"
+        return None
+
+    def _apply_budget(
+        self,
+        selected: list[tuple[str, str, int]],
+        skipped: dict[str, int],
+    ) -> list[tuple[str, str, int]]:
+        """Return the attachments, in order, that fit within `--max-bytes`."""
+
+        budget = self.options.max_bytes
+        within: list[tuple[str, str, int]] = []
+
+        for job in selected:
+            if job[2] > budget:
+                skipped["max-bytes"] += 1
+                continue
+            budget -= job[2]
+            within.append(job)
+
+        return within
@@ -1,12 +1,14 @@
 """Mail `list` command module."""
 
+from itertools import islice
 from time import localtime, strftime
-from typing import Any
+from typing import Any, Callable, Iterator
 
 from loguru import logger
 
 from gmail.api import GoogleMailAPI
 from gmail.commands import GoogleMailCmd
+from gmail.pipeline import Pipeline
 
 
 class MailListCmd(GoogleMailCmd):
@@ -83,6 +85,20 @@ class MailListCmd(GoogleMailCmd):
 
         self.add_limit_option(parser)
 
+        parser.add_argument(
+            "--threads",
+            action="store_true",
+            help="list conversations, fetching each thread's messages in one request",
+        )
+
+        arg = parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="fetch messages with `WORKERS` concurrent requests",
+        )
+        self.cli.add_default_to_help(arg, parser)
+
     def run(self) -> None:
         """Run mail `list` command."""
 
@@ -91,6 +107,55 @@ class MailListCmd(GoogleMailCmd):
             self.display_message(msg)
             return
 
+        self._set_search_query()
+
+        print(
+            str.format(
+                "Searching for {!r} in {!r}", self.options.search_query, self.options.label_ids
+            )
+        )
+
+        noun = "Thread" if self.options.threads else "Message"
+        next_id = (
+            self.cli.api.get_next_thread_id
+            if self.options.threads
+            else self.cli.api.get_next_msg_id
+        )
+        fetch_and_format: Callable[[str], tuple[str, str]] = (
+            self._fetch_and_format_thread if self.options.threads else self._fetch_and_format
+        )
+
+        ids = next_id(
+            label_ids=self.options.label_ids,
+            search_query=self.options.search_query,
+        )
+
+        if not (
+            self.options.pretty_print or self.options.print_listing or self.options.print_message
+        ):
+            for idx, item_id in enumerate(ids):
+                if self.check_limit():
+                    break
+                logger.info("{} {} id {!r}", noun, idx + 1, item_id)
+            return
+
+        # Don't enumerate (and fetch) more than `--limit` items.
+        if self.options.limit is not None:
+            ids = islice(ids, max(0, self.options.limit))
+
+        with Pipeline(ids, fetch_and_format, workers=self.options.workers) as pipe:
+            for idx, (item_id, text) in enumerate(pipe):
+                if self.check_limit():
+                    break
+
+                if not self.options.print_listing:
+                    logger.info("{} {} id {!r}", noun, idx + 1, item_id)
+
+                print(text, end="")
+
+    def _set_search_query(self) -> None:
+        """Set `--search-query` from the canned query options."""
+
         # See https://support.google.com/mail/answer/7190?hl=en
 
         if self.options.has_attachments:
@@ -102,31 +167,49 @@ class MailListCmd(GoogleMailCmd):
         elif self.options.has_videos:
             self.options.search_query = "filename:(mp4 OR wmv OR mov OR mpg)"
 
-        print(
-            str.format(
-                "Searching for {!r} in {!r}", self.options.search_query, self.options.label_ids
-            )
-        )
+    def _fetch_and_format(self, msg_id: str) -> tuple[str, str]:
+        """Fetch and format `msg_id`; called by pipeline worker threads."""
+
+        msg = self.cli.api.get_message(msg_id)
+        return msg_id, self.format_message(msg)
+
+    def format_message(self, msg: dict[str, Any]) -> str:
+        """Return `msg` formatted as `display_message` would print it."""
 
-        for idx, msg_id in enumerate(
-            self.cli.api.get_next_msg_id(
-                label_ids=self.options.label_ids,
-                search_query=self.options.search_query,
+        if self.options.pretty_print:
+            return self.pformat(msg, max_string=200)
+        if self.options.print_listing:
+            return self.format_listing(msg) + "\n"
+        if self.options.print_message:
+            return "".join(line + "\n" for line in self.format_items(msg))
+        return ""  # pragma: no cover
+
+    def _fetch_and_format_thread(self, thread_id: str) -> tuple[str, str]:
+        """Fetch and format `thread_id`; called by pipeline worker threads."""
+
+        if self.options.print_listing:
+            thread = self.cli.api.get_thread(
+                thread_id, fmt="metadata", metadata_headers=["From", "Subject"]
             )
-        ):
-            if self.check_limit():
-                break
+        else:
+            thread = self.cli.api.get_thread(thread_id)
+        return thread_id, self.format_thread(thread)
+
+    def format_thread(self, thread: dict[str, Any]) -> str:
+        """Return `thread`: one line, or its messages grouped together."""
 
-            if not self.options.print_listing:
-                logger.info("Message {} id {!r}", idx + 1, msg_id)
+        if self.options.pretty_print:
+            return self.pformat(thread, max_string=200)
+
+        msgs = thread.get("messages", [])
+        if not msgs:
+            return ""  # pragma: no cover
 
-            if (
-                self.options.pretty_print
-                or self.options.print_listing
-                or self.options.print_message
-            ):
-                msg = self.cli.api.get_message(msg_id)
-                self.display_message(msg)
+        if self.options.print_listing:
+            return str.format("{} [{}]\n", self.format_listing(msgs[-1]), len(msgs))
+
+        header = str.format("THREAD {!r} with {} messages\n", thread["id"], len(msgs))
+        return header + "".join(self.format_message(msg) for msg in msgs)
 
     def display_message(self, msg: dict[str, Any]) -> None:
         """Display `msg`."""
@@ -141,12 +224,18 @@ class MailListCmd(GoogleMailCmd):
     def print_message(self, msg: dict[str, Any]) -> None:
         """Docstring."""
 
+        for line in self.format_items(msg):
+            print(line)
+
+    def format_items(self, msg: dict[str, Any]) -> Iterator[str]:
+        """Yield the lines printed by `print_message`."""
+
         # logger.debug("msg {!r}", msg)
 
         for key, value in msg.items():
-            self._print_item("MSG", key, value)
+            yield self._format_item("MSG", key, value)
 
-        self._print_item(
+        yield self._format_item(
             "MSG",
             "LOCALTIME",
             strftime("%Y-%m-%d %H:%M:%S %Z", localtime(int(msg["internalDate"]) / 1000)),
@@ -155,57 +244,33 @@ class MailListCmd(GoogleMailCmd):
         payload = msg["payload"]
 
         for key, value in payload.items():
-            self._print_item("PAYLOAD", key, value)
+            yield self._format_item("PAYLOAD", key, value)
 
         headers = payload["headers"]
         for hdr_dict in headers:
             key = hdr_dict["name"]
             value = hdr_dict["value"]
-            self._print_item("HEADER", key, value)
+            yield self._format_item("HEADER", key, value)
 
         try:
             msg_subject = [h["value"] for h in headers if h["name"] == "Subject"][0]
         except IndexError:  # pragma: no cover
             msg_subject = ""  # pragma: no cover
-        self._print_item("HEADER", "SUBJECT", msg_subject)
+        yield self._format_item("HEADER", "SUBJECT", msg_subject)
 
         try:
             msg_from = [h["value"] for h in headers if h["name"] == "From"][0]
         except IndexError:  # pragma: no cover
             msg_from = ""  # pragma: no cover
-        self._print_item("HEADER", "FROM", msg_from)
+        yield self._format_item("HEADER", "FROM", msg_from)
 
     def print_listing(self, msg: dict[str, Any]) -> None:
         """Docstring."""
 
-        # logger.info('msg {!r}', msg.keys())
-
-        # self._print_item('MSG', 'id', msg['id'])
-        # self._print_item('MSG', 'snippet', msg['snippet'])
-        # self._print_item('MSG', 'sizeEstimate', msg['sizeEstimate'])
-        # self._print_item('MSG', 'labelIds', msg['labelIds'])
-
-        timestamp = strftime("%Y-%m-%d %H:%M:%S %Z", localtime(int(msg["internalDate"]) / 1000))
-
-        payload = msg["payload"]
-        headers = payload["headers"]
-
-        try:
-            msg_subject = [h["value"] for h in headers if h["name"] == "Subject"][0]
-        except IndexError:  # pragma: no cover
-            msg_subject = ""  # pragma: no cover
-        # self._print_item('HEADER', 'SUBJECT', msg_subject)
-
-        try:
-            msg_from = [h["value"] for h in headers if h["name"] == "From"][0]
-        except IndexError:  # pragma: no cover
-            msg_from = ""  # pragma: no cover
-        # self._print_item('HEADER', 'FROM', msg_from)
-
-        print(str.format("{} {:<40} {}", timestamp, msg_from, msg_subject))
+        print(self.format_listing(msg))
 
     @staticmethod
-    def _print_item(tag: str, key: str, value: str) -> None:
+    def _format_item(tag: str, key: str, value: str) -> str:
         """Docstring."""
         truncated = str(value)[:90] + (str(value)[90:] and "...")
-        print(str.format("{!r:<7} {!r:<20} {!r}", tag, key, truncated))
+        return str.format("{!r:<7} {!r:<20} {!r}", tag, key, truncated)
@@ -0,0 +1,149 @@
+"""Mail `stats` command module."""
+
+import json
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+from gmail.api import GoogleMailAPI
+from gmail.commands import GoogleMailCmd
+from gmail.pipeline import Pipeline
+from gmail.stats import MailboxStats
+
+
+def positive_int(text: str) -> int:
+    """Return `text` as an integer of at least 1."""
+
+    if (value := int(text)) < 1:
+        raise ValueError(f"{value} is less than 1")
+    return value
+
+
+class MailStatsCmd(GoogleMailCmd):
+    """Mail `stats` command class."""
+
+    def init_command(self) -> None:
+        """Initialize mail `stats` command."""
+
+        parser = self.add_subcommand_parser(
+            "stats",
+            help="print mailbox statistics",
+            description=self.cli.dedent("""
+    The `%(prog)s` program prints message counts and sizes per label,
+    per month, and the top senders, of the matching messages.
+
+    Only message metadata is fetched, in batches of 50 messages per
+    request. Top senders and the number of
+    distinct senders are approximate (constant-memory sketches); the
+    `error` of each top sender bounds its overcount.
+                """),
+        )
+
+        group = parser.add_argument_group("Filtering options")
+
+        arg = group.add_argument(
+            "--label-ids",
+            nargs="*",
+            default=GoogleMailAPI.default_label_ids(),
+            help="match labels",
+        )
+        self.cli.add_default_to_help(arg, group)
+
+        group.add_argument(
+            "--has-attachments",
+            action="store_true",
+            help="search messages with any files attached",
+        )
+
+        group.add_argument(
+            "--search-query",
+            help="gmail search box query pattern",
+        )
+
+        group = parser.add_argument_group("Printing options")
+
+        arg = group.add_argument(
+            "--top",
+            type=positive_int,
+            default=10,
+            help="print the top `TOP` senders",
+        )
+        self.cli.add_default_to_help(arg, group)
+
+        group.add_argument(
+            "--json",
+            action="store_true",
+            help="print statistics as json",
+        )
+
+        self.add_limit_option(parser)
+
+        arg = parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="fetch messages with `WORKERS` concurrent batch requests",
+        )
+        self.cli.add_default_to_help(arg, parser)
+
+    def run(self) -> None:
+        """Run mail `stats` command."""
+
+        if self.options.has_attachments:
+            self.options.search_query = "has:attachment"
+
+        msg_ids = self.cli.api.get_next_msg_id(
+            label_ids=self.options.label_ids,
+            search_query=self.options.search_query,
+        )
+        if self.options.limit is not None:
+            msg_ids = islice(msg_ids, max(0, self.options.limit))
+
+        stats = MailboxStats(top=self.options.top)
+
+        batches = self._batched(msg_ids, self.cli.api.max_batch_size)
+        with Pipeline(batches, self._fetch, workers=self.options.workers) as pipe:
+            for msgs in pipe:
+                for msg in msgs:
+                    stats.add(msg)
+
+        if self.options.json:
+            print(json.dumps(stats.as_dict(), indent=2))
+        else:
+            self.print_table(stats.as_dict())
+
+    def _fetch(self, msg_ids: list[str]) -> list[dict[str, Any]]:
+        """Fetch metadata of `msg_ids` in one batch; called by pipeline worker threads."""
+
+        return self.cli.api.get_messages(msg_ids, fmt="metadata", metadata_headers=["From"])
+
+    @staticmethod
+    def _batched(items: Iterable[str], size: int) -> Iterator[list[str]]:
+        """Yield lists of up to `size` items."""
+
+        it = iter(items)
+        while batch := list(islice(it, size)):
+            yield batch
+
+    @staticmethod
+    def print_table(stats: dict[str, Any]) -> None:
+        """Print `stats` as text tables."""
+
+        print(str.format("{:<40} {:>9} {:>14}", "", "messages", "bytes"))
+        print(str.format("{:<40} {:>9} {:>14}", "TOTAL", stats["messages"], stats["bytes"]))
+        print(str.format("{:<40} {:>9}", "distinct senders (approx)", stats["distinct_senders"]))
+
+        for title, rows in (("LABEL", stats["labels"]), ("MONTH", stats["months"])):
+            print()
+            print(str.format("{:<40} {:>9} {:>14}", title, "messages", "bytes"))
+            for key, row in rows.items():
+                print(str.format("{:<40} {:>9} {:>14}", key, row["messages"], row["bytes"]))
+
+        for key in ("messages", "bytes"):
+            print()
+            print(
+                str.format("{:<40} {:>14} {:>9}", "TOP SENDERS BY " + key.upper(), key, "error")
+            )
+            for row in stats["top_senders_by_" + key]:
+                print(
+                    str.format("{:<40.40} {:>14} {:>9}", row["sender"], row[key], row["error"])
+                )
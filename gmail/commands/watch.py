@@ -0,0 +1,274 @@
+"""Mail `watch` command module."""
+
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import xdg
+from googleapiclient.errors import HttpError  # type: ignore[import-untyped]
+from httplib2 import HttpLib2Error  # type: ignore[import-untyped]
+from loguru import logger
+
+from gmail.api import GoogleMailAPI
+from gmail.commands import GoogleMailCmd
+
+# Errors from the service or network that polling may outlive.
+TRANSIENT_ERRORS = (HttpError, HttpLib2Error, OSError)
+
+
+class MailWatchCmd(GoogleMailCmd):
+    """Mail `watch` command class."""
+
+    def init_command(self) -> None:
+        """Initialize mail `watch` command."""
+
+        parser = self.add_subcommand_parser(
+            "watch",
+            help="watch for new mail messages",
+            description=self.cli.dedent("""
+    The `%(prog)s` program keeps one connection to the mail service
+    and polls the mailbox history for new messages, running the
+    selected actions on each one.
+
+    The last `historyId` handled is saved, and the next run resumes
+    from it, so mail that arrives between runs is not missed. Use
+    `--since` to resume from another position. The position is saved
+    after each message, so a run cut short by `--limit` or an error
+    resumes with the next message.
+
+    Rate limits, server and network errors are logged, and polling
+    backs off and continues; with `--once`, they end the run.
+
+    The polling interval starts at `--min-interval`, and backs off
+    toward `--max-interval` while the mailbox is idle. With `--listen`,
+    any HTTP `POST` to `PORT` (e.g., a push notification relay) wakes
+    the poller immediately.
+                """),
+        )
+
+        group = parser.add_argument_group("Action options")
+
+        group.add_argument(
+            "--print-listing",
+            action="store_true",
+            help="print listing of each new message (default action)",
+        )
+
+        group.add_argument(
+            "--download",
+            action="store_true",
+            help="download image/video/pdf attachments of each new message",
+        )
+
+        group = parser.add_argument_group("Polling options")
+
+        arg = group.add_argument(
+            "--label-id",
+            default=GoogleMailAPI.default_label_ids()[0],
+            help="watch for messages added to `LABEL_ID`",
+        )
+        self.cli.add_default_to_help(arg, group)
+
+        arg = group.add_argument(
+            "--min-interval",
+            type=float,
+            default=5.0,
+            help="poll every `MIN_INTERVAL` seconds while mail is arriving",
+        )
+        self.cli.add_default_to_help(arg, group)
+
+        arg = group.add_argument(
+            "--max-interval",
+            type=float,
+            default=60.0,
+            help="back off to polling every `MAX_INTERVAL` seconds while idle",
+        )
+        self.cli.add_default_to_help(arg, group)
+
+        group.add_argument(
+            "--since",
+            metavar="HISTORY_ID",
+            help="handle messages added after `HISTORY_ID` (default: where last run stopped)",
+        )
+
+        group.add_argument(
+            "--listen",
+            type=int,
+            metavar="PORT",
+            help="wake the poller on any HTTP `POST` to localhost `PORT`",
+        )
+
+        group.add_argument(
+            "--once",
+            action="store_true",
+            help="poll once and exit",
+        )
+
+        self.add_limit_option(parser)
+
+    def run(self) -> None:
+        """Run mail `watch` command."""
+
+        if not self.options.print_listing and not self.options.download:
+            self.options.print_listing = True
+
+        wakeup = threading.Event()
+        server = self._start_listener(wakeup) if self.options.listen else None
+
+        self.history_id = self.start_history_id()
+        interval = self.options.min_interval
+        logger.info("Watching {!r} from historyId {}", self.options.label_id, self.history_id)
+
+        try:
+            while True:
+                if not self.options.once:
+                    wakeup.wait(timeout=interval)
+                if wakeup.is_set():
+                    logger.debug("Woken by push notification")
+                    wakeup.clear()
+                    interval = self.options.min_interval
+
+                try:
+                    handled = self.poll_and_handle()
+                except TRANSIENT_ERRORS as err:
+                    if self.options.once or not self.is_transient(err):
+                        raise
+                    interval = min(interval * 2, self.options.max_interval)
+                    logger.warning("{}; retrying in {}s", err, interval)
+                    continue
+
+                if handled is None or self.options.once:
+                    return  # `--limit` reached, or `--once`
+
+                interval = (
+                    self.options.min_interval
+                    if handled
+                    else min(interval * 2, self.options.max_interval)
+                )
+                logger.debug("{} new messages; next poll in {}s", handled, interval)
+
+        except KeyboardInterrupt:  # pragma: no cover
+            pass
+
+        finally:
+            if server:
+                server.shutdown()
+
+    def poll_and_handle(self) -> int | None:
+        """Handle messages added since the saved position; return how many, or None at `--limit`.
+
+        The position is saved after each message, so an error or `--limit`
+        leaves the rest for the next poll or run.
+        """
+
+        added, history_id = self.poll(self.history_id)
+
+        for idx, (msg_id, record_id) in enumerate(added):
+            if self.check_limit():
+                return None
+            self.handle_message(msg_id)
+            # A record may add several messages; resume past it only when all are handled.
+            if idx + 1 == len(added) or added[idx + 1][1] != record_id:
+                self.save_history_id(record_id)
+
+        self.save_history_id(history_id)
+        return len(added)
+
+    @staticmethod
+    def is_transient(err: Exception) -> bool:
+        """Return True if `err` may succeed when retried."""
+
+        if isinstance(err, HttpError):
+            status: int = err.status_code
+            return (
+                status == HTTPStatus.TOO_MANY_REQUESTS
+                or status >= HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+        return True
+
+    @property
+    def history_file(self) -> Path:
+        """Return path of the file that saves the last `historyId` handled."""
+        return xdg.xdg_state_home() / "gmail" / f"watch-{self.options.label_id}.history"
+
+    def start_history_id(self) -> str:
+        """Return `--since`, the saved `historyId`, or the mailbox's current `historyId`."""
+
+        if history_id := self.options.since or self.load_history_id():
+            return str(history_id)
+
+        history_id = self.cli.api.get_history_id()
+        self.save_history_id(history_id)
+        return history_id
+
+    def load_history_id(self) -> str | None:
+        """Return the saved `historyId`, or None."""
+
+        try:
+            history_id = self.history_file.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        logger.debug("Resuming from saved historyId {}", history_id)
+        return history_id or None
+
+    def save_history_id(self, history_id: str) -> None:
+        """Save `history_id` as the position to resume from."""
+
+        self.history_id = history_id
+        self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        self.history_file.write_text(history_id + "\n", encoding="utf-8")
+
+    def poll(self, history_id: str) -> tuple[list[tuple[str, str]], str]:
+        """Return messages added since `history_id`, and the new `historyId`.
+
+        See `GoogleMailAPI.get_history`.
+        """
+
+        try:
+            return self.cli.api.get_history(history_id, label_id=self.options.label_id)
+        except HttpError as err:  # pragma: no cover
+            if err.status_code != HTTPStatus.NOT_FOUND:
+                raise
+            logger.warning("historyId {} expired; resyncing", history_id)
+            return [], self.cli.api.get_history_id()
+
+    def handle_message(self, msg_id: str) -> None:
+        """Run the selected actions on new message `msg_id`."""
+
+        try:
+            msg = self.cli.api.get_message(msg_id)
+        except HttpError as err:  # pragma: no cover
+            if err.status_code != HTTPStatus.NOT_FOUND:
+                raise
+            logger.warning("Message {!r} vanished: {}", msg_id, err)
+            return
+
+        if self.options.print_listing:
+            print(self.format_listing(msg), flush=True)
+
+        if self.options.download:
+            for mimetype, filename, attachment_id, _, _ in self.cli.api.get_next_attachment_id(
+                msg_id, msg=msg
+            ):
+                if self.cli.api.is_media(mimetype):
+                    print("Downloading", filename, flush=True)
+                    self.cli.api.download_attachment(msg_id, attachment_id, filename)
+
+    def _start_listener(self, wakeup: threading.Event) -> ThreadingHTTPServer:
+        """Start a local webhook that sets `wakeup` on each `POST`."""
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.send_response(HTTPStatus.NO_CONTENT)
+                self.end_headers()
+                wakeup.set()
+
+            def log_message(self, fmt: str, *args: object) -> None:
+                logger.trace(fmt % args)
+
+        server = ThreadingHTTPServer(("localhost", self.options.listen), _Handler)
+        threading.Thread(target=server.serve_forever, name="listen", daemon=True).start()
+        logger.info("Listening for push notifications on port {}", self.options.listen)
+        return server
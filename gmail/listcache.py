@@ -0,0 +1,203 @@
+"""On-disk cache of message id lists, kept current with mailbox history."""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+__all__ = ["ListCache"]
+
+# Search operators whose matches depend on labels.
+_LABEL_OPERATORS = re.compile(
+    r"\b(?:is|in|label|category):|\bhas:(?:no)?userlabels\b|\bhas:\S+-star\b", re.IGNORECASE
+)
+
+
+class ListCache:
+    """Cache the results of `messages.list`, keyed by normalized (labels, query).
+
+    Each entry records the `historyId`, and the time, at which it was
+    captured. On reuse, the caller fetches the history since then and
+    calls `patch`:
+
+        no changes:     the cached ids are still exact.
+        label-only key: membership is recomputed from each changed
+                        message's `labelIds`, and deletions are removed.
+        query key:      deletions are removed; messages added since
+                        capture are resolved by one narrow `messages.list`
+                        of `recent_query`. A label change on an older
+                        message (e.g., marking it read) keeps its
+                        membership, unless it touches a key label, `SPAM`
+                        or `TRASH` and may add the message, or the query
+                        uses label operators (`is:`, `in:`, `label:`,
+                        `category:`); then the caller must re-list.
+
+    Patched ids are not strictly in `messages.list` order: for a
+    label-only key, added ids are put first in reverse history order,
+    which is the order they arrived in, not by `internalDate`. Callers
+    that need exact order should not use the cache.
+    """
+
+    # `messages.list` excludes these unless asked for by label.
+    hidden_label_ids = frozenset(["SPAM", "TRASH"])
+
+    # Seconds to widen `recent_query`, for clock skew with the service.
+    recent_margin = 600
+
+    def __init__(self, path: Path) -> None:
+        """Keep cache entries in directory `path`."""
+
+        self.path = Path(path)
+
+    @staticmethod
+    def key(label_ids: list[str] | None, search_query: str | None) -> tuple[list[str], str]:
+        """Return normalized `(label_ids, search_query)`."""
+        return sorted(set(label_ids or [])), " ".join((search_query or "").split())
+
+    def _file(self, label_ids: list[str] | None, search_query: str | None) -> Path:
+        digest = hashlib.sha1(
+            json.dumps(self.key(label_ids, search_query)).encode(), usedforsecurity=False
+        )
+        return self.path / (digest.hexdigest() + ".json")
+
+    def load(
+        self, label_ids: list[str] | None, search_query: str | None
+    ) -> dict[str, Any] | None:
+        """Return the cache entry for `(label_ids, search_query)`, or None."""
+
+        try:
+            with open(self._file(label_ids, search_query), encoding="utf-8") as fp:
+                entry: dict[str, Any] = json.load(fp)
+        except FileNotFoundError:
+            return None
+        except ValueError:  # pragma: no cover
+            logger.warning("Ignoring corrupt cache entry for {!r}", (label_ids, search_query))
+            return None
+
+        if entry.get("key") != list(self.key(label_ids, search_query)):
+            return None  # pragma: no cover; digest collision
+        return entry
+
+    def save(
+        self,
+        label_ids: list[str] | None,
+        search_query: str | None,
+        history_id: str,
+        msg_ids: list[str],
+        listed_at: float,
+    ) -> None:
+        """Save `msg_ids`, as of `history_id` at time `listed_at`, for the key."""
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        file = self._file(label_ids, search_query)
+        tmp = file.with_suffix(".tmp")
+
+        with open(tmp, "w", encoding="utf-8") as fp:
+            json.dump(
+                {
+                    "key": list(self.key(label_ids, search_query)),
+                    "history_id": history_id,
+                    "listed_at": int(listed_at),
+                    "msg_ids": msg_ids,
+                },
+                fp,
+            )
+        os.replace(tmp, file)
+        logger.debug("Cached {} msg ids at historyId {}", len(msg_ids), history_id)
+
+    @classmethod
+    def recent_query(cls, entry: dict[str, Any], records: list[dict[str, Any]]) -> str | None:
+        """Return the search query that `patch` needs listed for `records`, or None.
+
+        This is the entry's query narrowed to messages received since
+        capture, when `records` added messages to a query key.
+        """
+
+        _, search_query = entry["key"]
+        if not search_query or "listed_at" not in entry:
+            return None
+        if not any(_.get("messagesAdded") for _ in records):
+            return None
+        return f"{search_query} after:{entry['listed_at'] - cls.recent_margin}"
+
+    @classmethod
+    def _relabel(
+        cls,
+        change: dict[str, Any],
+        member: dict[str, bool],
+        wanted: set[str],
+        labeled: bool,
+    ) -> bool:
+        """Apply a label `change` of an older message to a query key; False to re-list.
+
+        The query's own terms still hold for the message; only its labels
+        changed. `labeled` is whether its labels now satisfy the key.
+        """
+
+        if "labelIds" not in change:
+            return False
+        if not set(change["labelIds"]) & (wanted | cls.hidden_label_ids):
+            return True  # e.g., `UNREAD` toggled
+        msg_id = change["message"]["id"]
+        if member.get(msg_id, False):
+            member[msg_id] = labeled
+            return True
+        return not labeled  # may now match; only a re-list can tell
+
+    @classmethod
+    def patch(
+        cls,
+        entry: dict[str, Any],
+        records: list[dict[str, Any]],
+        recent_ids: list[str] | None = None,
+    ) -> list[str] | None:
+        """Return the entry's ids updated by history `records`, or None to re-list.
+
+        `recent_ids` are the ids listed for `recent_query`, if any.
+        """
+
+        label_ids, search_query = entry["key"]
+        wanted = set(label_ids)
+        hidden = cls.hidden_label_ids - wanted
+        label_query = bool(search_query) and _LABEL_OPERATORS.search(search_query) is not None
+
+        member = dict.fromkeys(entry["msg_ids"], True)
+        added: set[str] = set()
+
+        for record in records:
+            for change in record.get("messagesDeleted", []):
+                member[change["message"]["id"]] = False
+
+            for kind in ("messagesAdded", "labelsAdded", "labelsRemoved"):
+                for change in record.get(kind, []):
+                    msg = change["message"]
+                    msg_labels = set(msg.get("labelIds", []))
+                    labeled = wanted <= msg_labels and not hidden & msg_labels
+                    if kind == "messagesAdded":
+                        added.add(msg["id"])
+                    if not search_query or msg["id"] in added:
+                        member[msg["id"]] = labeled
+                    elif label_query or not cls._relabel(change, member, wanted, labeled):
+                        logger.debug("Relabel may affect {!r}; re-listing", search_query)
+                        return None
+
+        cached = set(entry["msg_ids"])
+        if not search_query:
+            new = [_ for _ in member if _ not in cached and member[_]][::-1]
+            return new + [_ for _ in entry["msg_ids"] if member[_]]
+
+        if added:
+            if recent_ids is None:
+                return None
+            recent = set(recent_ids)
+            for msg_id in added:
+                member[msg_id] = msg_id in recent
+            new = [_ for _ in recent_ids if _ not in cached]
+        else:
+            new = []
+
+        return new + [_ for _ in entry["msg_ids"] if member[_]]
@@ -0,0 +1,163 @@
+"""Bounded, order-preserving worker pipeline."""
+
+import queue
+import threading
+from types import TracebackType
+from typing import Any, Callable, Generic, Iterable, Iterator, TypeVar
+
+from loguru import logger
+
+from gmail.profiling import timed
+
+__all__ = ["Pipeline"]
+
+T = TypeVar("T")
+U = TypeVar("U")
+
+_POLL = 0.1  # seconds between checks of the stop flag
+
+
+class Pipeline(Generic[T, U]):
+    """Run `stage` over `source` with `workers` threads; yield results in order.
+
+    The stages are:
+
+        enumerate:  one thread pulls items from `source`.
+        stage:      `workers` threads call `stage(item)`.
+        write:      the caller iterates the pipeline and consumes results.
+
+    At most `depth` items are in flight (enumerated but not yet consumed),
+    so memory stays bounded when the consumer is slower than the workers,
+    and a slow item cannot let the reorder buffer grow without limit.
+
+    Use as a context manager; leaving the block (`break`, `--limit`,
+    exceptions) stops the enumerator and workers from starting new work.
+    """
+
+    def __init__(
+        self,
+        source: Iterable[T],
+        stage: Callable[[T], U],
+        workers: int = 4,
+        depth: int | None = None,
+    ) -> None:
+        """Prepare, but do not start, the pipeline."""
+
+        self.source = source
+        self.stage = timed(stage)
+        self.workers = max(1, workers)
+        self.depth = max(self.workers, depth or 4 * self.workers)
+
+        self._window = threading.Semaphore(self.depth)
+        self._todo: queue.Queue[tuple[int, T] | None] = queue.Queue()
+        self._done: queue.Queue[tuple[int, Any]] = queue.Queue()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._total: int | None = None
+        self._error: BaseException | None = None
+
+    def __enter__(self) -> "Pipeline[T, U]":
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Start the enumerator and worker threads."""
+
+        self._threads.append(
+            threading.Thread(target=self._enumerate, name="enumerate", daemon=True)
+        )
+        for idx in range(self.workers):
+            self._threads.append(
+                threading.Thread(target=self._work, name=f"worker-{idx}", daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+
+    def close(self) -> None:
+        """Stop starting new work and wait for the threads to finish."""
+
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def __iter__(self) -> Iterator[U]:
+        """Yield results of `stage` in `source` order."""
+
+        pending: dict[int, Any] = {}
+        seq = 0
+
+        while True:
+            if seq in pending:
+                result = pending.pop(seq)
+                self._window.release()
+                seq += 1
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+                continue
+
+            if self._total is not None and seq >= self._total:
+                if self._error is not None:
+                    raise self._error
+                return
+
+            try:
+                idx, result = self._done.get(timeout=_POLL)
+            except queue.Empty:
+                self._check_alive()
+                continue
+            if idx >= 0:
+                pending[idx] = result
+
+    def _check_alive(self) -> None:
+        """Raise if the threads that owe us results have died."""
+
+        enumerator, *workers = self._threads
+        if self._total is None and not enumerator.is_alive():
+            raise RuntimeError("Pipeline enumerator thread died")
+        if not any(_.is_alive() for _ in workers) and self._done.empty():
+            raise RuntimeError("Pipeline worker threads died")
+
+    def _enumerate(self) -> None:
+        count = 0
+        try:
+            for item in self.source:
+                while not self._window.acquire(timeout=_POLL):
+                    if self._stop.is_set():
+                        return
+                if self._stop.is_set():
+                    return
+                self._todo.put((count, item))
+                count += 1
+        except BaseException as err:  # re-raised by consumer
+            self._error = err
+        finally:
+            logger.trace("Enumerated {} items", count)
+            self._total = count
+            for _ in range(self.workers):
+                self._todo.put(None)
+            self._done.put((-1, None))  # wake the consumer
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self._todo.get(timeout=_POLL)
+            except queue.Empty:
+                continue
+            if job is None:
+                return
+            idx, item = job
+            try:
+                result: Any = self.stage(item)
+            except BaseException as err:  # re-raised by consumer
+                result = err
+            self._done.put((idx, result))
@@ -0,0 +1,144 @@
+"""CPU profiling and allocation tracking of a command."""
+
+import cProfile
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType, ModuleType
+from typing import Any, Callable, Iterator, TypeVar
+
+resource: ModuleType | None
+try:
+    import resource
+except ImportError:  # pragma: no cover; not on Windows
+    resource = None
+
+__all__ = ["cpu_profile", "timed", "trace_malloc"]
+
+T = TypeVar("T")
+U = TypeVar("U")
+
+# Wall time of pipeline stages, by name: `[calls, seconds]`; None when not profiling.
+_stage_times: dict[str, list[float]] | None = None
+_stage_lock = threading.Lock()
+
+
+def timed(stage: Callable[[T], U]) -> Callable[[T], U]:
+    """Return `stage`, wrapped to record its wall time while `cpu_profile` is active."""
+
+    if (times := _stage_times) is None:
+        return stage
+    name = getattr(stage, "__qualname__", repr(stage))
+
+    def _timed(item: T) -> U:
+        start = time.perf_counter()
+        try:
+            return stage(item)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _stage_lock:
+                totals = times.setdefault(name, [0, 0.0])
+                totals[0] += 1
+                totals[1] += elapsed
+
+    return _timed
+
+
+@contextmanager
+def cpu_profile(path: Path, tag: str, top: int = 25) -> Iterator[None]:
+    """Profile the block, in all threads; dump `pstats` to `path` and print a summary.
+
+    The dump can be read with `python -m pstats`, or converted to a
+    flamegraph with tools such as `flameprof` or `snakeviz`.
+
+    From 3.12, one profiler sees the events of all threads on a single
+    call stack, so its times for worker threads are not valid. The wall
+    time of each `Pipeline` stage is recorded apart, and printed after
+    the profile, on all versions.
+    """
+
+    global _stage_times  # noqa: PLW0603
+
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def _start_thread_profiler(_frame: FrameType, _event: str, _arg: Any) -> None:
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    # From 3.12, `cProfile` uses `sys.monitoring`, which sees every thread
+    # and allows only one active profiler; before, each thread needs its own.
+    per_thread = sys.version_info < (3, 12)
+
+    if per_thread:  # pragma: no cover
+        threading.setprofile(_start_thread_profiler)
+    stage_times: dict[str, list[float]] = {}
+    _stage_times = stage_times
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        if per_thread:  # pragma: no cover
+            threading.setprofile(None)
+        with lock:
+            for profiler in profilers:
+                profiler.disable()
+            stats = pstats.Stats(*profilers, stream=sys.stderr)
+        _stage_times = None
+
+        stats.dump_stats(path)
+        print(f"\n===== CPU profile of {tag!r}", file=sys.stderr)
+        print(f"===== Saved to {str(path)!r}", file=sys.stderr)
+        if not per_thread:
+            print("===== Times of worker threads are not valid; see below", file=sys.stderr)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+        print(f"===== Wall time of pipeline stages of {tag!r}", file=sys.stderr)
+        print(f"{'ncalls':>8} {'cumtime':>10}  stage", file=sys.stderr)
+        with _stage_lock:
+            for name, (calls, seconds) in stage_times.items():
+                print(f"{int(calls):8d} {seconds:10.3f}  {name}", file=sys.stderr)
+
+
+@contextmanager
+def trace_malloc(tag: str, top: int = 10, nframes: int = 1) -> Iterator[None]:
+    """Track allocations in the block; print the `top` allocation sites and peaks."""
+
+    tracemalloc.start(nframes)
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        snapshot = snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ]
+        )
+
+        print(f"\n===== Allocations of {tag!r}", file=sys.stderr)
+        print(f"===== Peak traced {peak / 1024:,.1f} KiB", file=sys.stderr)
+        if (rss := _peak_rss()) is not None:
+            print(f"===== Peak RSS {rss / 1024:,.1f} KiB", file=sys.stderr)
+
+        for idx, stat in enumerate(snapshot.statistics("lineno")[:top]):
+            print(f"{idx + 1:3} {stat}", file=sys.stderr)
+
+
+def _peak_rss() -> int | None:
+    """Return peak resident set size in bytes, if available."""
+
+    if resource is None:
+        return None  # pragma: no cover
+
+    rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
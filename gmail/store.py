@@ -0,0 +1,322 @@
+"""Compressed, memory-mapped local message store."""
+
+import json
+import mmap
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Iterable, Iterator, TextIO
+
+from loguru import logger
+
+__all__ = ["MessageStore"]
+
+# Strings common to most messages, laid out as `_dumps` writes them;
+# zlib looks back at most 32KiB, and prefers the end of the dictionary.
+_TEMPLATE = {
+    "id": "",
+    "threadId": "",
+    "snippet": "",
+    "payload": {
+        "partId": "",
+        "mimeType": "multipart/alternative",
+        "filename": "",
+        "headers": [
+            {"name": name, "value": ""}
+            for name in (
+                "Delivered-To",
+                "Received",
+                "X-Received",
+                "ARC-Seal",
+                "ARC-Message-Signature",
+                "ARC-Authentication-Results",
+                "Return-Path",
+                "Received-SPF",
+                "Authentication-Results",
+                "DKIM-Signature",
+                "X-Google-DKIM-Signature",
+                "X-Gm-Message-State",
+                "List-Unsubscribe",
+                "MIME-Version",
+                "Date",
+                "Message-ID",
+                "Subject",
+                "From",
+                "To",
+                "Content-Type",
+            )
+        ],
+        "body": {"size": 0},
+        "parts": [
+            {
+                "partId": "0",
+                "mimeType": "text/plain",
+                "filename": "",
+                "headers": [
+                    {"name": "Content-Type", "value": 'text/plain; charset="UTF-8"'},
+                    {"name": "Content-Transfer-Encoding", "value": "quoted-printable"},
+                ],
+                "body": {"size": 0, "data": ""},
+            },
+            {
+                "partId": "1",
+                "mimeType": "text/html",
+                "filename": "",
+                "headers": [
+                    {"name": "Content-Type", "value": 'text/html; charset="UTF-8"'},
+                    {"name": "Content-Transfer-Encoding", "value": "quoted-printable"},
+                ],
+                "body": {"size": 0, "data": ""},
+            },
+        ],
+    },
+    "sizeEstimate": 0,
+    "internalDate": "",
+}
+
+# Message fields that change over its life; kept apart from the compressed body.
+_MUTABLE = ("labelIds", "historyId")
+
+
+def _dumps(msg: dict[str, Any]) -> bytes:
+    return json.dumps(msg, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class MessageStore:
+    """Append-only store of messages, compressed with a shared dictionary.
+
+    Layout of the store directory:
+
+        dictionary:     zlib preset dictionary shared by all records.
+        segment-NNNNNN: concatenated compressed records; append-only.
+        index:          one `msg_id segment offset length` line per record;
+                        a negative segment marks a discarded message.
+        labels:         one JSON line of the mutable fields (`labelIds`,
+                        `historyId`) per update; rewritten on open when
+                        mostly superseded.
+        history:        the mailbox `historyId` through which the mutable
+                        fields of stored messages are current; see
+                        `GoogleMailAPI.sync_store`.
+
+    The index and labels are loaded into dicts on open, for O(1) lookup
+    by id. Segments are read through `mmap`, and only the requested
+    record is decompressed. Records are written before their index line,
+    so a torn write leaves at most an unreferenced record. Label changes
+    append only a small line, never a copy of the message.
+    """
+
+    segment_size = 64 << 20  # start a new segment after this many bytes
+    labels_slack = 1000  # superseded labels lines tolerated before compacting
+
+    def __init__(self, path: Path, samples: Iterable[dict[str, Any]] | None = None) -> None:
+        """Open (or create) the store in directory `path`.
+
+        When creating the store, the dictionary is built from `samples`,
+        if given, or from a template of common message structure.
+        """
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._maps: dict[int, mmap.mmap] = {}
+        self._index: dict[str, tuple[int, int, int]] = {}
+
+        dict_file = self.path / "dictionary"
+        if not dict_file.exists():
+            dict_file.write_bytes(self.build_dictionary(samples))
+        self.zdict = dict_file.read_bytes()
+
+        index_file = self.path / "index"
+        line = ""
+        if index_file.exists():
+            with open(index_file, encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        msg_id, segment, offset, length = line.split()
+                        if int(segment) < 0:
+                            self._index.pop(msg_id, None)
+                        else:
+                            self._index[msg_id] = (int(segment), int(offset), int(length))
+                    except ValueError:
+                        logger.warning("Ignoring torn index line {!r}", line)
+        self._index_fp = open(index_file, "a", encoding="utf-8")  # noqa: SIM115
+        if line and not line.endswith("\n"):
+            self._index_fp.write("\n")  # terminate torn line
+
+        self._segment = max((_[0] for _ in self._index.values()), default=0)
+
+        self._labels: dict[str, dict[str, Any]] = {}
+        self._labels_fp = self._open_labels()
+        logger.debug("Opened store {!r} with {} messages", str(self.path), len(self._index))
+
+    @staticmethod
+    def build_dictionary(samples: Iterable[dict[str, Any]] | None = None) -> bytes:
+        """Return a zlib preset dictionary built from `samples`."""
+
+        data = b"".join(_dumps(_) for _ in samples or [_TEMPLATE])
+        return data[-32768:]
+
+    def _open_labels(self) -> TextIO:
+        """Load the labels file; compact it if mostly superseded; return it open to append."""
+
+        labels_file = self.path / "labels"
+        nlines = 0
+        line = ""
+        if labels_file.exists():
+            with open(labels_file, encoding="utf-8") as fp:
+                for line in fp:
+                    nlines += 1
+                    try:
+                        fields = json.loads(line)
+                        self._labels[fields["id"]] = fields
+                    except (ValueError, KeyError):
+                        logger.warning("Ignoring torn labels line {!r}", line)
+
+        live = {_: self._labels[_] for _ in self._index if _ in self._labels}
+        if nlines > 2 * len(live) + self.labels_slack:
+            tmp = labels_file.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as fp:
+                for fields in live.values():
+                    fp.write(json.dumps(fields, separators=(",", ":")) + "\n")
+            os.replace(tmp, labels_file)
+            logger.debug("Compacted labels from {} to {} lines", nlines, len(live))
+            self._labels = live
+            line = ""
+
+        fp = open(labels_file, "a", encoding="utf-8")  # noqa: SIM115
+        if line and not line.endswith("\n"):
+            fp.write("\n")  # terminate torn line
+        return fp
+
+    @property
+    def history_id(self) -> str | None:
+        """Return the `historyId` through which stored messages are current, or None."""
+
+        try:
+            return (self.path / "history").read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    @history_id.setter
+    def history_id(self, history_id: str) -> None:
+        (self.path / "history").write_text(history_id + "\n", encoding="utf-8")
+
+    def close(self) -> None:
+        """Close the index and unmap all segments."""
+
+        with self._lock:
+            self._index_fp.close()
+            self._labels_fp.close()
+            for _ in self._maps.values():
+                _.close()
+            self._maps.clear()
+
+    def __enter__(self) -> "MessageStore":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, msg_id: object) -> bool:
+        return msg_id in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        """Yield the ids of all stored messages."""
+        return iter(list(self._index))
+
+    def put(self, msg: dict[str, Any]) -> None:
+        """Append `msg` to the store, replacing any previous version."""
+
+        body = {k: v for k, v in msg.items() if k not in _MUTABLE}
+        compressor = zlib.compressobj(level=9, zdict=self.zdict)
+        data = compressor.compress(_dumps(body)) + compressor.flush()
+
+        with self._lock:
+            segment_file = self._segment_file(self._segment)
+            if segment_file.exists() and segment_file.stat().st_size >= self.segment_size:
+                self._segment += 1
+                segment_file = self._segment_file(self._segment)
+
+            with open(segment_file, "ab") as fp:
+                offset = fp.tell()
+                fp.write(data)
+
+            self._index[msg["id"]] = (self._segment, offset, len(data))
+            self._index_fp.write(f"{msg['id']} {self._segment} {offset} {len(data)}\n")
+            self._index_fp.flush()
+            self._write_labels({"id": msg["id"]} | {_: msg[_] for _ in _MUTABLE if _ in msg})
+
+    def set_labels(self, msg_id: str, label_ids: list[str], history_id: str) -> None:
+        """Update the mutable fields of stored message `msg_id`."""
+
+        with self._lock:
+            self._write_labels({"id": msg_id, "labelIds": label_ids, "historyId": history_id})
+
+    def _write_labels(self, fields: dict[str, Any]) -> None:
+        self._labels[fields["id"]] = fields
+        self._labels_fp.write(json.dumps(fields, separators=(",", ":")) + "\n")
+        self._labels_fp.flush()
+
+    def discard(self, msg_id: str) -> None:
+        """Forget `msg_id`, if stored; its record is left unreferenced."""
+
+        with self._lock:
+            self._labels.pop(msg_id, None)
+            if self._index.pop(msg_id, None) is not None:
+                self._index_fp.write(f"{msg_id} -1 0 0\n")
+                self._index_fp.flush()
+
+    def clear(self) -> None:
+        """Forget all stored messages."""
+
+        with self._lock:
+            self._index_fp.close()
+            self._labels_fp.close()
+            for _ in self._maps.values():
+                _.close()
+            self._maps.clear()
+            self._index.clear()
+            self._labels.clear()
+            for _ in self.path.glob("segment-*"):
+                _.unlink()
+            self._segment = 0
+            self._index_fp = open(self.path / "index", "w", encoding="utf-8")  # noqa: SIM115
+            self._labels_fp = open(self.path / "labels", "w", encoding="utf-8")  # noqa: SIM115
+        logger.debug("Cleared store {!r}", str(self.path))
+
+    def get_bytes(self, msg_id: str) -> bytes:
+        """Return the JSON body of `msg_id`, less mutable fields; raise KeyError if absent."""
+
+        segment, offset, length = self._index[msg_id]
+        view = self._map(segment, offset + length)
+        decompressor = zlib.decompressobj(zdict=self.zdict)
+        return decompressor.decompress(view[offset : offset + length]) + decompressor.flush()
+
+    def get(self, msg_id: str) -> dict[str, Any]:
+        """Return message `msg_id`; raise KeyError if not stored."""
+
+        msg: dict[str, Any] = json.loads(self.get_bytes(msg_id))
+        msg.update(self._labels.get(msg_id, {}))
+        return msg
+
+    def _segment_file(self, segment: int) -> Path:
+        return self.path / f"segment-{segment:06d}"
+
+    def _map(self, segment: int, size: int) -> mmap.mmap:
+        """Return a map of `segment` that is at least `size` bytes long."""
+
+        view = self._maps.get(segment)
+        if view is not None and len(view) >= size:
+            return view
+
+        with self._lock:
+            # The segment may have grown; readers keep any older map alive.
+            if (view := self._maps.get(segment)) is not None and len(view) >= size:
+                return view
+            with open(self._segment_file(segment), "rb") as fp:
+                view = self._maps[segment] = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            return view
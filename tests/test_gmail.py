@@ -1,11 +1,16 @@
 import os
 import sys
 from argparse import Namespace
+from pathlib import Path
+from typing import Any
 
 import pytest
+from googleapiclient.errors import HttpError  # type: ignore[import-untyped]
 
 from gmail.api import GoogleMailAPI
 from gmail.cli import GoogleMailCLI
+from gmail.commands.download import MailDownloadCmd, parse_size
+from gmail.commands.watch import MailWatchCmd
 
 # import sys
 # from loguru import logger
@@ -128,3 +133,178 @@ def test_download_msg_id(mail: GoogleMailAPI) -> None:
         run_cli(["download", msg_id])
         if i >= 2:
             break
+
+
+def test_list_print_listing_workers_8_limit_10() -> None:
+    run_cli(["list", "--print-listing", "--workers", "8", "--limit", "10"])
+
+
+def test_watch_once(mail: GoogleMailAPI) -> None:
+    since = str(int(mail.get_history_id()) - 1000)
+    run_cli(["watch", "--once", "--since", since, "--limit", "3"])
+    # resumes from the saved position
+    run_cli(["watch", "--once", "--limit", "3"])
+
+
+def test_watch_once_download(mail: GoogleMailAPI) -> None:
+    since = str(int(mail.get_history_id()) - 1000)
+    run_cli(
+        ["watch", "--once", "--since", since, "--print-listing", "--download", "--limit", "3"]
+    )
+
+
+def test_stats_limit_20() -> None:
+    run_cli(["stats", "--limit", "20"])
+
+
+def test_stats_json_has_attachments_limit_20() -> None:
+    run_cli(["stats", "--json", "--has-attachments", "--limit", "20"])
+
+
+@pytest.mark.parametrize(
+    ("text", "size"),
+    [("512", 512), ("100K", 102400), ("2.5M", 2621440), ("1g", 1 << 30), ("10KB", 10240)],
+)
+def test_parse_size(text: str, size: int) -> None:
+    assert parse_size(text) == size
+
+
+def test_parse_size_invalid() -> None:
+    with pytest.raises(ValueError, match="invalid size"):
+        parse_size("lots")
+
+
+def test_download_skip_reason_matches_original_filename() -> None:
+    cmd = MailDownloadCmd.__new__(MailDownloadCmd)
+    cmd.options = Namespace(filename=["report.pdf", "*.png"], min_size=None, max_size=100)
+    assert cmd._skip_reason("report.pdf", 10) is None
+    assert cmd._skip_reason("photo.png", 10) is None
+    assert cmd._skip_reason("photo.png", 1000) == "max-size"
+    assert cmd._skip_reason("report-18abc.pdf", 10) == "filename"
+
+
+def test_download_msg_id_smallest_max_bytes(mail: GoogleMailAPI) -> None:
+    search_query = "has:attachment"
+    for i, msg_id in enumerate(mail.get_next_msg_id(search_query=search_query)):
+        run_cli(["download", msg_id, "--order", "smallest", "--max-bytes", "1M"])
+        run_cli(["download", msg_id, "--mimetype", "image/*", "--max-size", "100K"])
+        run_cli(["download", msg_id, "--filename", "*.pdf", "--order", "largest"])
+        if i >= 2:
+            break
+
+
+def test_list_store_print_listing_limit_3() -> None:
+    run_cli(["--store", "list", "--print-listing", "--limit", "3"])
+    run_cli(["--store", "list", "--print-listing", "--limit", "3"])
+
+
+def test_list_profile_trace_malloc_limit_3(tmp_path: Path) -> None:
+    run_cli(
+        [
+            "--profile",
+            str(tmp_path / "list.prof"),
+            "--trace-malloc",
+            "list",
+            "--print-listing",
+            "--limit",
+            "3",
+        ]
+    )
+
+
+def test_list_threads_print_listing_limit_3() -> None:
+    run_cli(["list", "--threads", "--print-listing", "--limit", "3"])
+
+
+def test_list_threads_print_message_limit_2() -> None:
+    run_cli(["list", "--threads", "--print-message", "--limit", "2"])
+
+
+def test_list_threads_limit_5() -> None:
+    run_cli(["list", "--threads", "--limit", "5"])
+
+
+def test_list_cache_has_images() -> None:
+    run_cli(["--cache", "list", "--has-images"])
+    run_cli(["--cache", "list", "--has-images", "--print-listing", "--limit", "3"])
+
+
+def test_labels_cache_show_counts() -> None:
+    run_cli(["--cache", "labels", "--show-counts", "--limit", "3"])
+    run_cli(["--cache", "labels", "--show-counts", "--limit", "3"])
+
+
+def test_attachment_paths_are_unique() -> None:
+    api = GoogleMailAPI.__new__(GoogleMailAPI)
+    api.download_dir = Path("/dl")
+    parts = [
+        {
+            "partId": f"1.{n}",
+            "mimeType": "image/png",
+            "filename": name,
+            "body": {"attachmentId": f"a{n}"},
+        }
+        for n, name in enumerate(["image.png", "image.png", "other.png", "image.png"])
+    ]
+    msg = {"payload": {"parts": parts}}
+    paths = [_[1] for _ in api.get_next_attachment_id("m1", msg=msg)]
+    assert paths == [
+        "/dl/image-m1.png",
+        "/dl/image-m1-1.1.png",
+        "/dl/other-m1.png",
+        "/dl/image-m1-1.3.png",
+    ]
+
+
+class _FakeWatchAPI:
+    history = [("m1", "11"), ("m2", "12"), ("m3", "12"), ("m4", "13")]
+
+    def __init__(self, fail: str | None = None) -> None:
+        self.fail = fail
+        self.fetched: list[str] = []
+
+    def get_history(self, start: str, label_id: str) -> tuple[list[tuple[str, str]], str]:
+        return [_ for _ in self.history if int(_[1]) > int(start)], "20"
+
+    def get_message(self, msg_id: str) -> dict[str, Any]:
+        if msg_id == self.fail:
+            raise HttpError(Namespace(status=503, reason="Unavailable"), b"")
+        self.fetched.append(msg_id)
+        return {"id": msg_id}
+
+
+def _watch_cmd(api: _FakeWatchAPI, limit: int | None) -> MailWatchCmd:
+    cmd = MailWatchCmd.__new__(MailWatchCmd)
+    cmd.cli = Namespace(api=api)  # type: ignore[assignment]
+    cmd.options = Namespace(
+        label_id="INBOX", since=None, limit=limit, print_listing=False, download=False
+    )
+    cmd.history_id = "10"
+    return cmd
+
+
+def test_watch_resumes_after_limit_and_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+
+    # `--limit` between two messages of one record resumes at that record.
+    cmd = _watch_cmd(api := _FakeWatchAPI(), limit=2)
+    assert cmd.poll_and_handle() is None
+    assert api.fetched == ["m1", "m2"]
+    assert cmd.load_history_id() == "11"
+
+    # A server error does not advance past the failed message.
+    cmd = _watch_cmd(api := _FakeWatchAPI(fail="m4"), limit=None)
+    cmd.history_id = "11"
+    with pytest.raises(HttpError):
+        cmd.poll_and_handle()
+    assert cmd.is_transient(HttpError(Namespace(status=503, reason=""), b""))
+    assert not cmd.is_transient(HttpError(Namespace(status=403, reason=""), b""))
+    assert cmd.load_history_id() == "12"
+
+    cmd = _watch_cmd(api := _FakeWatchAPI(), limit=None)
+    cmd.history_id = "12"
+    assert cmd.poll_and_handle() == 1
+    assert api.fetched == ["m4"]
+    assert cmd.load_history_id() == "20"
@@ -0,0 +1,108 @@
+from pathlib import Path
+
+from gmail.listcache import ListCache
+
+
+def _change(msg_id: str, *labels: str) -> dict[str, dict[str, object]]:
+    return {"message": {"id": msg_id, "labelIds": list(labels)}}
+
+
+def test_key_normalized(tmp_path: Path) -> None:
+    cache = ListCache(tmp_path)
+    cache.save(
+        ["UNREAD", "INBOX", "INBOX"], "  has:attachment   larger:1M ", "100", ["a", "b"], 1e9
+    )
+
+    entry = cache.load(["INBOX", "UNREAD"], "has:attachment larger:1M")
+    assert entry is not None
+    assert entry["history_id"] == "100"
+    assert entry["msg_ids"] == ["a", "b"]
+    assert entry["listed_at"] == 1_000_000_000
+
+    assert cache.load(["INBOX"], "has:attachment larger:1M") is None
+    assert cache.load(["INBOX", "UNREAD"], None) is None
+
+
+def test_patch_no_changes() -> None:
+    entry = {"key": [["INBOX"], "has:attachment"], "history_id": "1", "msg_ids": ["b", "a"]}
+    assert ListCache.patch(entry, []) == ["b", "a"]
+
+
+def test_patch_label_only() -> None:
+    entry = {"key": [["INBOX"], ""], "history_id": "1", "msg_ids": ["c", "b", "a"]}
+    records = [
+        {"messagesAdded": [_change("d", "INBOX", "UNREAD")]},
+        {"messagesAdded": [_change("e", "SENT")]},
+        {"labelsRemoved": [_change("b", "INBOX")]},
+        {"messagesDeleted": [_change("a")]},
+        {"labelsAdded": [_change("c", "INBOX", "TRASH")]},
+        {"messagesAdded": [_change("f", "INBOX")]},
+        {"labelsAdded": [_change("e", "SENT", "INBOX")]},
+    ]
+    assert ListCache.patch(entry, records) == ["f", "e", "d", "b"]
+
+
+def test_patch_trash_requested() -> None:
+    entry = {"key": [["TRASH"], ""], "history_id": "1", "msg_ids": []}
+    records = [{"labelsAdded": [_change("a", "TRASH")]}]
+    assert ListCache.patch(entry, records) == ["a"]
+
+
+def test_patch_query() -> None:
+    entry = {"key": [["INBOX"], "is:unread"], "history_id": "1", "msg_ids": ["b", "a"]}
+    assert ListCache.patch(entry, [{"messagesDeleted": [_change("a")]}]) == ["b"]
+    assert ListCache.patch(entry, [{"labelsRemoved": [_change("b", "INBOX")]}]) is None
+    assert ListCache.patch(entry, [{"messagesAdded": [_change("c", "INBOX")]}]) is None
+
+
+def test_patch_query_recent() -> None:
+    entry = {
+        "key": [["INBOX"], "is:unread"],
+        "history_id": "1",
+        "listed_at": 1_000_000_000,
+        "msg_ids": ["b", "a"],
+    }
+    assert ListCache.recent_query(entry, [{"messagesDeleted": [_change("a")]}]) is None
+
+    records = [
+        {"messagesAdded": [_change("c", "INBOX", "UNREAD")]},
+        {"messagesAdded": [_change("d", "INBOX", "UNREAD")]},
+        {"messagesAdded": [_change("e", "INBOX", "UNREAD")]},
+        {"labelsRemoved": [_change("d", "INBOX")]},
+        {"messagesDeleted": [_change("a")]},
+    ]
+    assert ListCache.recent_query(entry, records) == "is:unread after:999999400"
+    assert ListCache.patch(entry, records, ["e", "c", "b"]) == ["e", "c", "b"]
+
+    records.append({"labelsRemoved": [_change("b", "INBOX")]})
+    assert ListCache.patch(entry, records, ["e", "c"]) is None
+
+
+def test_patch_query_relabel() -> None:
+    entry = {"key": [["INBOX"], "filename:pdf"], "history_id": "1", "msg_ids": ["b", "a"]}
+
+    def _relabel(msg_id: str, changed: str, *labels: str) -> dict[str, object]:
+        return _change(msg_id, *labels) | {"labelIds": [changed]}
+
+    # Reading mail (UNREAD removed) leaves the entry patched in place.
+    records = [
+        {"labelsRemoved": [_relabel("b", "UNREAD", "INBOX")]},
+        {"labelsAdded": [_relabel("z", "UNREAD", "INBOX", "UNREAD")]},
+    ]
+    assert ListCache.patch(entry, records) == ["b", "a"]
+
+    # Leaving a key label, or going to TRASH, removes a cached message.
+    records = [
+        {"labelsRemoved": [_relabel("b", "INBOX")]},
+        {"labelsAdded": [_relabel("a", "TRASH", "INBOX", "TRASH")]},
+    ]
+    assert ListCache.patch(entry, records) == []
+
+    # A message that gains a key label may now match the query.
+    assert ListCache.patch(entry, [{"labelsAdded": [_relabel("z", "INBOX", "INBOX")]}]) is None
+
+    # Label operators in the query always re-list.
+    entry["key"] = [["INBOX"], "is:unread filename:pdf"]
+    assert (
+        ListCache.patch(entry, [{"labelsRemoved": [_relabel("b", "UNREAD", "INBOX")]}]) is None
+    )
@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+from typing import Iterator
+
+import pytest
+
+from gmail.pipeline import Pipeline
+
+
+def _slow_square(n: int) -> int:
+    time.sleep(random.random() / 100)
+    return n * n
+
+
+def test_pipeline_preserves_order() -> None:
+    with Pipeline(range(50), _slow_square, workers=8) as pipe:
+        assert list(pipe) == [n * n for n in range(50)]
+
+
+def test_pipeline_empty_source() -> None:
+    with Pipeline(range(0), _slow_square) as pipe:
+        assert not list(pipe)
+
+
+def test_pipeline_bounded_in_flight() -> None:
+    enumerated = 0
+
+    def _source() -> Iterator[int]:
+        nonlocal enumerated
+        for n in range(1000):
+            enumerated += 1
+            yield n
+
+    with Pipeline(_source(), _slow_square, workers=2, depth=5) as pipe:
+        for n, _ in enumerate(pipe):
+            time.sleep(0.01)  # slow consumer
+            # consumed + in-flight + one waiting for a slot
+            assert enumerated <= (n + 1) + 5 + 1
+            if n == 20:
+                break
+
+    assert enumerated <= 21 + 5 + 1
+
+
+def test_pipeline_break_cancels_upstream() -> None:
+    calls = 0
+    lock = threading.Lock()
+
+    def _count(n: int) -> int:
+        nonlocal calls
+        with lock:
+            calls += 1
+        return n
+
+    with Pipeline(range(100_000), _count, workers=4, depth=8) as pipe:
+        for n in pipe:
+            if n == 3:
+                break
+
+    assert calls <= 4 + 8
+
+
+def test_pipeline_stage_error() -> None:
+    def _fail(n: int) -> int:
+        if n == 3:
+            raise ValueError(n)
+        return n
+
+    with pytest.raises(ValueError, match="3"), Pipeline(range(10), _fail) as pipe:
+        assert list(pipe) == [0, 1, 2]
+
+
+def test_pipeline_source_error() -> None:
+    def _source() -> Iterator[int]:
+        yield 1
+        yield 2
+        raise RuntimeError("list failed")
+
+    results: list[int] = []
+    with pytest.raises(RuntimeError, match="list failed"), Pipeline(_source(), int) as pipe:
+        results.extend(pipe)
+    assert results == [1, 2]
+
+
+class _DeadWorkerPipeline(Pipeline[int, int]):
+    def _work(self) -> None:
+        raise SystemExit  # dies outside the worker's try
+
+
+class _DeadEnumeratorPipeline(Pipeline[int, int]):
+    def _enumerate(self) -> None:
+        raise SystemExit  # dies before reporting a total
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_pipeline_dead_workers() -> None:
+    with (
+        pytest.raises(RuntimeError, match="worker"),
+        _DeadWorkerPipeline(range(10), int) as pipe,
+    ):
+        list(pipe)
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_pipeline_dead_enumerator() -> None:
+    with (
+        pytest.raises(RuntimeError, match="enumerator"),
+        _DeadEnumeratorPipeline(range(10), int) as pipe,
+    ):
+        list(pipe)
@@ -0,0 +1,70 @@
+import pstats
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+from gmail.pipeline import Pipeline
+from gmail.profiling import cpu_profile, trace_malloc
+
+
+def _work(n: int) -> list[int]:
+    time.sleep(0.001)
+    return [n] * 1000
+
+
+def test_cpu_profile_threads(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    path = tmp_path / "list.prof"
+    with cpu_profile(path, "gmail list --limit 3"), Pipeline(range(10), _work) as pipe:
+        assert len(list(pipe)) == 10
+
+    err = capsys.readouterr().err
+    assert "CPU profile of 'gmail list --limit 3'" in err
+    stats = pstats.Stats(str(path))
+    assert any(func == "_work" for _, _, func in stats.stats)  # type: ignore[attr-defined]
+
+
+def test_cpu_profile_counts_each_call_once(tmp_path: Path) -> None:
+    # From 3.12, a second active profiler raises; every thread must still be seen.
+    path = tmp_path / "workers.prof"
+    for _ in range(2):
+        with cpu_profile(path, "workers"), Pipeline(range(20), _work, workers=8) as pipe:
+            assert len(list(pipe)) == 20
+
+    stats = pstats.Stats(str(path)).stats  # type: ignore[attr-defined]
+    calls = [
+        value[1]
+        for (file, _, func), value in stats.items()
+        if func == "_work" and file.endswith("test_profiling.py")
+    ]
+    assert calls == [20]
+
+
+def _wait(n: int) -> int:
+    time.sleep(0.05)
+    return n
+
+
+def test_cpu_profile_stage_wall_time(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    # Worker wait must not be undercounted, whatever cProfile makes of the threads.
+    path = tmp_path / "wait.prof"
+    with cpu_profile(path, "wait"), Pipeline(range(40), _wait, workers=8) as pipe:
+        assert len(list(pipe)) == 40
+
+    err = capsys.readouterr().err
+    match = re.search(r"^\s*(\d+)\s+([\d.]+)\s+_wait$", err, re.MULTILINE)
+    assert match is not None
+    assert int(match[1]) == 40
+    assert 2.0 <= float(match[2]) < 4.0
+
+
+def test_trace_malloc(capsys: pytest.CaptureFixture[str]) -> None:
+    with trace_malloc("gmail download X", top=3):
+        data = [_work(n) for n in range(10)]
+    assert len(data) == 10
+
+    err = capsys.readouterr().err
+    assert "Allocations of 'gmail download X'" in err
+    assert "Peak traced" in err
+    assert "test_profiling.py" in err
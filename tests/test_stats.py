@@ -0,0 +1,75 @@
+import random
+from typing import Any
+
+import pytest
+
+from gmail.commands.stats import positive_int
+from gmail.stats import HyperLogLog, MailboxStats, SpaceSaving
+
+
+def _msg(
+    sender: str, size: int, labels: list[str], when: int = 1_700_000_000_000
+) -> dict[str, Any]:
+    return {
+        "sizeEstimate": size,
+        "internalDate": str(when),
+        "labelIds": labels,
+        "payload": {"headers": [{"name": "From", "value": sender}]},
+    }
+
+
+def test_space_saving_finds_heavy_hitters() -> None:
+    rng = random.Random(1)
+    sketch = SpaceSaving(20)
+    stream = (
+        ["alice"] * 500 + ["bob"] * 300 + [f"noise{rng.randrange(5000)}" for _ in range(2000)]
+    )
+    rng.shuffle(stream)
+    for item in stream:
+        sketch.add(item)
+
+    top = sketch.top(2)
+    assert [item for item, _, _ in top] == ["alice", "bob"]
+    for item, count, error in top:
+        true = stream.count(item)
+        assert count - error <= true <= count
+    assert len(sketch.counts) == 20
+
+
+def test_hyperloglog_estimate() -> None:
+    hll = HyperLogLog()
+    for n in range(100_000):
+        hll.add(f"sender{n}")
+        hll.add(f"sender{n}")
+    assert abs(len(hll) - 100_000) < 100_000 * 0.03
+
+
+def test_hyperloglog_small() -> None:
+    hll = HyperLogLog()
+    for n in range(10):
+        hll.add(str(n))
+    assert len(hll) == 10
+
+
+def test_mailbox_stats() -> None:
+    stats = MailboxStats(top=2)
+    stats.add(_msg("alice", 100, ["INBOX"]))
+    stats.add(_msg("alice", 50, ["INBOX", "UNREAD"]))
+    stats.add(_msg("bob", 1000, ["SENT"]))
+
+    result = stats.as_dict()
+    assert result["messages"] == 3
+    assert result["bytes"] == 1150
+    assert result["distinct_senders"] == 2
+    assert result["labels"]["INBOX"] == {"messages": 2, "bytes": 150}
+    assert result["top_senders_by_messages"][0] == {"sender": "alice", "messages": 2, "error": 0}
+    assert result["top_senders_by_bytes"][0] == {"sender": "bob", "bytes": 1000, "error": 0}
+    assert sum(m["messages"] for m in result["months"].values()) == 3
+
+
+def test_top_must_be_positive() -> None:
+    assert positive_int("1") == 1
+    with pytest.raises(ValueError, match="less than 1"):
+        positive_int("0")
+    with pytest.raises(ValueError, match="at least 1"):
+        SpaceSaving(0)
@@ -0,0 +1,135 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from gmail.store import MessageStore
+
+
+def _msg(n: int) -> dict[str, Any]:
+    return {
+        "id": f"msg{n:04d}",
+        "threadId": f"thread{n // 3:04d}",
+        "labelIds": ["INBOX", "UNREAD"],
+        "snippet": f"Hello number {n}, café ☕",
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [
+                {"name": "From", "value": f"sender{n % 7}@example.com"},
+                {"name": "Subject", "value": f"Subject {n}"},
+            ],
+            "body": {"size": 100 + n, "data": "SGVsbG8gd29ybGQ=" * (n % 5)},
+        },
+        "sizeEstimate": 1000 + n,
+        "internalDate": str(1_700_000_000_000 + n),
+    }
+
+
+def test_store_put_get(tmp_path: Path) -> None:
+    with MessageStore(tmp_path) as store:
+        for n in range(100):
+            store.put(_msg(n))
+        assert len(store) == 100
+        assert "msg0042" in store
+        assert "bogus" not in store
+        assert store.get("msg0042") == _msg(42)
+
+    with MessageStore(tmp_path) as store:
+        assert len(store) == 100
+        assert sorted(store) == [_msg(n)["id"] for n in range(100)]
+        assert store.get("msg0099") == _msg(99)
+
+
+def test_store_compresses(tmp_path: Path) -> None:
+    with MessageStore(tmp_path) as store:
+        raw = 0
+        for n in range(200):
+            store.put(_msg(n))
+            raw += len(store.get_bytes(_msg(n)["id"]))
+    stored = sum(_.stat().st_size for _ in tmp_path.glob("segment-*"))
+    assert stored < raw / 2
+
+
+def test_store_replace_and_segments(tmp_path: Path) -> None:
+    with MessageStore(tmp_path) as store:
+        store.segment_size = 512
+        for n in range(50):
+            store.put(_msg(n))
+        msg = _msg(7) | {"snippet": "changed"}
+        store.put(msg)
+        assert store.get("msg0007") == msg
+    assert len(list(tmp_path.glob("segment-*"))) > 1
+
+    with MessageStore(tmp_path) as store:
+        assert len(store) == 50
+        assert store.get("msg0007") == msg
+        assert store.get("msg0000") == _msg(0)
+
+
+def test_store_torn_index(tmp_path: Path) -> None:
+    with MessageStore(tmp_path) as store:
+        store.put(_msg(1))
+    with open(tmp_path / "index", "a", encoding="utf-8") as fp:
+        fp.write("msg0002 0 12")  # torn write
+
+    with MessageStore(tmp_path) as store:
+        assert len(store) == 1
+        store.put(_msg(3))
+
+    with MessageStore(tmp_path) as store:
+        assert sorted(store) == ["msg0001", "msg0003"]
+        assert store.get("msg0003") == _msg(3)
+
+
+def test_store_trained_dictionary(tmp_path: Path) -> None:
+    samples = [_msg(n) for n in range(10)]
+    with MessageStore(tmp_path, samples=samples) as store:
+        assert store.zdict == MessageStore.build_dictionary(samples)
+        store.put(_msg(11))
+        assert store.get("msg0011") == _msg(11)
+
+
+def test_store_discard_and_clear(tmp_path: Path) -> None:
+    with MessageStore(tmp_path) as store:
+        assert store.history_id is None
+        store.history_id = "12345"
+        for n in range(5):
+            store.put(_msg(n))
+        store.discard("msg0002")
+        store.discard("bogus")
+        assert "msg0002" not in store
+
+    with MessageStore(tmp_path) as store:
+        assert store.history_id == "12345"
+        assert sorted(store) == ["msg0000", "msg0001", "msg0003", "msg0004"]
+        store.put(_msg(2))
+        assert store.get("msg0002") == _msg(2)
+        store.clear()
+        assert len(store) == 0
+        assert not list(tmp_path.glob("segment-*"))
+        store.put(_msg(6))
+
+    with MessageStore(tmp_path) as store:
+        assert sorted(store) == ["msg0006"]
+        assert store.get("msg0006") == _msg(6)
+
+
+def test_store_set_labels(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(MessageStore, "labels_slack", 10)
+    with MessageStore(tmp_path) as store:
+        for n in range(5):
+            store.put(_msg(n) | {"historyId": "100"})
+        size = sum(_.stat().st_size for _ in tmp_path.glob("segment-*"))
+
+        for history_id in range(101, 200):
+            store.set_labels("msg0001", ["INBOX"], str(history_id))
+        assert store.get("msg0001") == _msg(1) | {"labelIds": ["INBOX"], "historyId": "199"}
+        assert b"UNREAD" not in store.get_bytes("msg0002")
+        # Label changes do not copy the message.
+        assert sum(_.stat().st_size for _ in tmp_path.glob("segment-*")) == size
+
+    with MessageStore(tmp_path) as store:
+        assert store.get("msg0001")["historyId"] == "199"
+        assert store.get("msg0002") == _msg(2) | {"historyId": "100"}
+    # Superseded lines are compacted on open.
+    assert len((tmp_path / "labels").read_text(encoding="utf-8").splitlines()) == 5